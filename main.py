@@ -1,68 +1,75 @@
 ﻿from __future__ import annotations
-import os, sys, json, subprocess, shutil, csv, time, warnings
+import os, sys, io, re, json, subprocess, shutil, csv, time, warnings, threading, queue, uuid, itertools, functools, shlex, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from datetime import datetime, UTC
 from typing import List, Dict, Any
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 try:
-    import psutil
+    import orjson
 except:
-    psutil = None
-
-try:
-    from rich.console import Console
-    from rich.table import Table
-    from rich.panel import Panel
-    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
-    from rich.align import Align
-    from rich.text import Text
-    from rich import box
-except:
-    print("Install rich")
-    raise
-
-try:
-    import pyfiglet
-except:
-    pyfiglet = None
+    orjson = None
 
 ROOT = os.path.abspath(os.path.dirname(__file__))
 FOLDERS = ["firmware", "hardware", "peripherals", "storage", "system"]
 RESULT_DIR = os.path.join(ROOT, "result")
 LOGS_DIR = os.path.join(ROOT, "logs")
+CACHE_DIR = os.path.join(LOGS_DIR, ".cache")
+EVENT_LOG_COUNT = 50
+CIM_LIST = "Get-CimInstance -ClassName {} | ForEach-Object {{ $_.CimInstanceProperties | ForEach-Object {{ $_.Name + '=' + $_.Value }}; '' }}"
 
 COMMANDS = {
     "systeminfo": "systeminfo",
-    "wmic_cpu": "wmic cpu get /format:list",
-    "wmic_bios": "wmic bios get /format:list",
-    "wmic_baseboard": "wmic baseboard get /format:list",
-    "wmic_diskdrive": "wmic diskdrive get /format:list",
-    "wmic_video": "wmic path win32_VideoController get /format:list",
+    "cim_cpu": CIM_LIST.format("Win32_Processor"),
+    "cim_bios": CIM_LIST.format("Win32_BIOS"),
+    "cim_baseboard": CIM_LIST.format("Win32_BaseBoard"),
+    "cim_diskdrive": CIM_LIST.format("Win32_DiskDrive"),
+    "cim_video": CIM_LIST.format("Win32_VideoController"),
     "driverquery": "driverquery /v /fo list",
-    "tasklist_csv": "tasklist /V /FO CSV",
-    "get_pnp_device": 'powershell -Command "Get-PnpDevice -PresentOnly | Format-List -Force"',
-    "get_physicaldisk": 'powershell -Command "Get-PhysicalDisk | Format-List *"',
-    "get_partition": 'powershell -Command "Get-Partition | Format-List *"',
-    "get_netadapter": 'powershell -Command "Get-NetAdapter | Format-List *"',
-    "wevtutil_system": "wevtutil qe System /c:200 /f:text",
-    "wevtutil_app": "wevtutil qe Application /c:200 /f:text",
+    "tasklist_csv": "tasklist /FO CSV",
+    "get_pnp_device": "Get-PnpDevice -PresentOnly | Format-List -Property *",
+    "get_physicaldisk": "Get-PhysicalDisk | Format-List *",
+    "get_partition": "Get-Partition | Format-List *",
+    "get_netadapter": "Get-NetAdapter | Format-List *",
+    "wevtutil_system": f"wevtutil qe System /c:{EVENT_LOG_COUNT} /rd:true /f:text",
+    "wevtutil_app": f"wevtutil qe Application /c:{EVENT_LOG_COUNT} /rd:true /f:text",
     "dxdiag": "dxdiag /t dxdiag_output.txt",
     "powercfg_query": "powercfg /q",
     "bcdedit": "bcdedit /enum all",
-    "wmic_logicaldevice": 'wmic path CIM_LogicalDevice get /format:list',
-    "wmic_service": "wmic service get /format:list",
+    "cim_logicaldevice": CIM_LIST.format("CIM_LogicalDevice"),
+    "cim_service": CIM_LIST.format("Win32_Service"),
 }
 
-console = Console()
+# Seconds a successful result may be reused from CACHE_DIR on later runs within the same boot; unlisted commands always execute.
+# Only queries without live properties belong here (Win32_Processor carries LoadPercentage, CurrentClockSpeed, ...).
+CACHE_TTL = {COMMANDS["cim_bios"]: 86400, COMMANDS["cim_baseboard"]: 86400}
+
+# rich, pyfiglet and psutil are imported on first use to keep interpreter startup cheap
+@functools.cache
+def load_psutil():
+    try:
+        import psutil
+        return psutil
+    except:
+        return None
+
+@dataclass(slots=True)
+class RunResult:
+    rc: int
+    out: str | bytes
+    err: str
 
 class Logger:
     def __init__(self):
-        self.lines = []
+        self.buf = bytearray()
+        self._ts_bucket, self._ts_str = -1, ""
 
     def _append(self, level, msg):
-        ts = datetime.now(UTC).isoformat() + "Z"
-        self.lines.append(f"[{level}] {ts} {msg}")
+        bucket = int(time.time())
+        if bucket != self._ts_bucket: self._ts_str, self._ts_bucket = datetime.fromtimestamp(bucket, UTC).isoformat() + "Z", bucket
+        self.buf.extend(f"[{level}] {self._ts_str} {msg}\n".encode("utf-8", "replace"))
 
     def info(self, msg): self._append("INFO", msg)
     def warn(self, msg): self._append("WARN", msg)
@@ -70,198 +77,403 @@ class Logger:
 
     def dump_to_file(self, path):
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write("\n".join(self.lines))
+            with open(path, "wb", buffering=1 << 20) as f:
+                f.write(self.buf)
             return True
         except Exception as e:
             return False
 
 logger = Logger()
 
-def run(cmd, timeout=60):
+_RUN_CACHE: Dict[str, RunResult] = {}
+_RUN_CACHE_LOCKS: Dict[str, threading.Lock] = {}
+_RUN_CACHE_GUARD = threading.Lock()
+
+def memoized(key, fn, ttl=0):
+    """Collection is one-shot, so identical queries (e.g. BIOS from hardware and firmware) run once per process."""
+    with _RUN_CACHE_GUARD: lock = _RUN_CACHE_LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        if key in _RUN_CACHE: logger.info(f"Cached: {key}")
+        else: _RUN_CACHE[key] = disk_cached(key, fn, ttl) if ttl > 0 else fn()
+    return _RUN_CACHE[key]
+
+@functools.cache
+def boot_marker():
+    psutil = load_psutil()
+    try: return str(int(psutil.boot_time())) if psutil else None
+    except: return None
+
+def disk_cached(key, fn, ttl):
+    # Keyed on boot time so a firmware update plus reboot is never masked; without psutil the disk cache is skipped
+    boot = boot_marker()
+    if boot is None: return fn()
+    path = os.path.join(CACHE_DIR, hashlib.sha1(f"{boot}:{key}".encode("utf-8")).hexdigest() + ".json")
+    try:
+        if time.time() - os.path.getmtime(path) < ttl:
+            with open(path, "r", encoding="utf-8") as f: res = RunResult(**json.load(f))
+            logger.info(f"Disk cache hit: {key}")
+            return res
+    except: pass
+    res = fn()
+    if res.rc == 0:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f: json.dump(asdict(res), f, ensure_ascii=False)
+        except Exception as e: logger.warn(f"Cache write failed: {key} - {e}")
+    return res
+
+@functools.lru_cache(maxsize=None)
+def to_argv(cmd):
+    """Commands are spawned directly rather than through cmd.exe; posix=False keeps Windows paths intact."""
+    return shlex.split(cmd, posix=False)
+
+def run(cmd, timeout=60, stdout_sink=None, text=True):
+    if stdout_sink is not None: return _run(cmd, timeout, stdout_sink)
+    return memoized(cmd if text else f"bytes:{cmd}", lambda: _run(cmd, timeout, text=text), CACHE_TTL.get(cmd, 0) if text else 0)
+
+def _run(cmd, timeout, stdout_sink=None, text=True):
     logger.info(f"Running: {cmd}")
     try:
-        proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
-        return {"rc": proc.returncode, "out": proc.stdout or "", "err": proc.stderr or ""}
+        if stdout_sink is not None:
+            stdout_sink.flush()
+            proc = subprocess.run(to_argv(cmd), stdout=stdout_sink, stderr=subprocess.PIPE, timeout=timeout)
+            return RunResult(proc.returncode, "", proc.stderr.decode(errors="replace"))
+        if not text:
+            proc = subprocess.run(to_argv(cmd), capture_output=True, timeout=timeout)
+            return RunResult(proc.returncode, proc.stdout, proc.stderr.decode(errors="replace"))
+        proc = subprocess.run(to_argv(cmd), capture_output=True, text=True, timeout=timeout)
+        return RunResult(proc.returncode, proc.stdout or "", proc.stderr or "")
     except subprocess.TimeoutExpired as e:
         logger.warn(f"Timeout: {cmd}")
-        return {"rc": -1, "out": e.stdout or "", "err": f"TIMEOUT: {e}"}
+        return RunResult(-1, e.stdout or ("" if text else b""), f"TIMEOUT: {e}")
+    except Exception as e:
+        logger.error(f"Error: {cmd} - {e}")
+        return RunResult(-1, "" if text else b"", str(e))
+
+def spawn(cmd, cwd=None):
+    logger.info(f"Starting: {cmd}")
+    try:
+        return subprocess.Popen(to_argv(cmd), cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     except Exception as e:
         logger.error(f"Error: {cmd} - {e}")
-        return {"rc": -1, "out": "", "err": str(e)}
+        return None
+
+def wait_proc(proc, cmd, timeout=60):
+    if proc is None: return RunResult(-1, "", f"Could not start: {cmd}")
+    try:
+        out, err = proc.communicate(timeout=timeout)
+        return RunResult(proc.returncode, out or "", err or "")
+    except subprocess.TimeoutExpired as e:
+        logger.warn(f"Timeout: {cmd}")
+        proc.kill()
+        out, _ = proc.communicate()
+        return RunResult(-1, out or "", f"TIMEOUT: {e}")
+
+class PowerShellSession:
+    """One long-lived powershell.exe fed over stdin; each query ends with a sentinel line."""
+    def __init__(self):
+        self.sentinel = f"<<<SENTINEL-{uuid.uuid4().hex}>>>"
+        self.proc = None
+        self.lines = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    def _start(self):
+        self.proc = subprocess.Popen(["powershell", "-NoProfile", "-NonInteractive", "-Command", "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace", bufsize=1)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.proc.stdout, self.lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(stream, lines):
+        for line in stream: lines.put(line)
+        lines.put(None)
+
+    def _read_until_sentinel(self, deadline, sink=None):
+        buf = []
+        while True:
+            line = self.lines.get(timeout=max(deadline - time.monotonic(), 0))
+            if line is None: raise EOFError("powershell exited")
+            if line.startswith(self.sentinel): return "".join(buf), line[len(self.sentinel):].strip()
+            if sink is not None: sink.write(line.encode("utf-8", "replace"))
+            else: buf.append(line)
+
+    def run(self, script, timeout=60, stdout_sink=None):
+        if stdout_sink is not None: return self._run(script, timeout, stdout_sink)
+        return memoized(f"ps:{script}", lambda: self._run(script, timeout), CACHE_TTL.get(script, 0))
+
+    def _run(self, script, timeout, stdout_sink=None):
+        logger.info(f"Running (ps): {script}")
+        try:
+            if self.proc is None or self.proc.poll() is not None: self._start()
+            self.proc.stdin.write(f"$Error.Clear(); $global:LASTEXITCODE = 0; & {{ {script} }} 2>$null | Out-String -Width 4096; '{self.sentinel}'; $Error | Out-String -Width 4096; '{self.sentinel}' + $(if ($Error.Count) {{ 1 }} else {{ $LASTEXITCODE }})\n")
+            self.proc.stdin.flush()
+            deadline = time.monotonic() + timeout
+            out, _ = self._read_until_sentinel(deadline, stdout_sink)
+            err, rc = self._read_until_sentinel(deadline)
+            return RunResult(int(rc) if rc.lstrip("-").isdigit() else -1, out, err.strip())
+        except queue.Empty:
+            logger.warn(f"Timeout: {script}")
+            self.close(graceful=False)
+            return RunResult(-1, "", f"TIMEOUT: {script} after {timeout}s")
+        except Exception as e:
+            logger.error(f"Error: {script} - {e}")
+            self.close(graceful=False)
+            return RunResult(-1, "", str(e))
+
+    def close(self, graceful=True):
+        if self.proc is None: return
+        try:
+            if graceful:
+                self.proc.stdin.write("exit\n"); self.proc.stdin.flush()
+                self.proc.wait(5)
+        except: pass
+        if self.proc.poll() is None: self.proc.kill()
+        self.proc = None
 
 def ensure_dirs():
     for d in FOLDERS: os.makedirs(os.path.join(ROOT, d), exist_ok=True)
     os.makedirs(RESULT_DIR, exist_ok=True)
     os.makedirs(LOGS_DIR, exist_ok=True)
 
-def write_summary_and_raw(folder, summary, raw_blocks):
+class RawWriter:
+    """A module's raw.txt, opened up front so large command output can be streamed into it instead of held in memory.
+
+    Output goes to raw.txt.partial and only replaces raw.txt on a clean close, so a failed module keeps the previous run's file.
+    """
+    def __init__(self, folder):
+        p = os.path.join(ROOT, folder)
+        os.makedirs(p, exist_ok=True)
+        self.path = os.path.join(p, "raw.txt")
+        self.partial = self.path + ".partial"
+        self.f = open(self.partial, "wb", buffering=1 << 16)
+        self.f.write(b"==== RAW OUTPUT ====\n")
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None: self.close()
+        else: self.discard()
+
+    def append(self, block):
+        if isinstance(block, str): block = block.encode("utf-8", "replace")
+        self.f.write(block + (b"\n" if not block.endswith(b"\n") else b"") + b"\n----\n\n")
+
+    def stream(self, name, runner, *args):
+        self.f.write(f"### {name}\n".encode("utf-8"))
+        r = runner(*args, stdout_sink=self.f)
+        self.f.seek(0, os.SEEK_END)
+        self.append("\nERR:\n" + r.err)
+        return r
+
+    def close(self):
+        if self.f.closed: return
+        self.f.close()
+        os.replace(self.partial, self.path)
+
+    def discard(self):
+        self.f.close()
+        try: os.remove(self.partial)
+        except: pass
+
+def write_json(path, obj):
+    if orjson:
+        with open(path, "wb") as f: f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+
+def write_summary_and_raw(folder, summary, raw):
     p = os.path.join(ROOT, folder)
     os.makedirs(p, exist_ok=True)
-    with open(os.path.join(p, "summary.json"), "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
-    with open(os.path.join(p, "raw.txt"), "w", encoding="utf-8", errors="replace") as f:
-        f.write("==== RAW OUTPUT ====\n")
-        for block in raw_blocks:
-            f.write(block + ("\n" if not block.endswith("\n") else "") + "\n----\n\n")
-
-def parse_wmic(text):
-    d = {}
-    for line in text.splitlines():
-        if "=" in line: k, v = line.split("=", 1); d[k.strip()] = v.strip()
-    return d
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(write_json, os.path.join(p, "summary.json"), summary), pool.submit(raw.close)]
+        for fut in futures: fut.result()
+
+_KV_COLON = re.compile(r"^[ \t]*([^:\s][^:\r\n]*?)[ \t]*:[ \t]*([^\r\n]*?)[ \t]*\r?$", re.M)
+_KV_EQ = re.compile(r"^[ \t]*([^=\s][^=\r\n]*?)[ \t]*=[ \t]*([^\r\n]*?)[ \t]*\r?$", re.M)
+_KV_PATTERNS = {":": _KV_COLON, "=": _KV_EQ}
+
+def parse_kv(text, sep=":"):
+    """Key/value lines split on the first sep, both sides trimmed; later keys win."""
+    return dict(_KV_PATTERNS[sep].findall(text))
+
+def split_records(text):
+    return [rec.strip("\n") for rec in re.split(r"\n\s*\n", text) if rec.strip()]
 
 def safe_read_file(path):
     try:
         with open(path, "r", encoding="utf-8", errors="replace") as f: return f.read()
     except: return f"<error reading {path}>"
 
-def collect_system():
+def collect_system(ps):
     start = time.perf_counter()
-    raw_blocks, summary = [], {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-    r = run(COMMANDS["systeminfo"], 30)
-    raw_blocks.append("### systeminfo\n" + r["out"] + "\nERR:\n" + r["err"])
-    summary["systeminfo_parsed"] = {k.strip(): v.strip() for line in r["out"].splitlines() if ":" in line for k, v in [line.split(":", 1)]}
-    r2 = run(COMMANDS["tasklist_csv"], 30)
-    raw_blocks.append("### tasklist\n" + r2["out"] + "\nERR:\n" + r2["err"])
-    try:
-        rows = list(csv.reader(r2["out"].splitlines()))
-        summary["process_sample"] = [dict(zip(rows[0], row)) for row in rows[1:41]] if rows else []
-    except: summary["process_sample_parse_error"] = "CSV error"
-    for cmd in ["wevtutil_system", "wevtutil_app", "driverquery", "wmic_service"]:
-        r = run(COMMANDS[cmd], 40)
-        raw_blocks.append(f"### {cmd}\n" + r["out"] + "\nERR:\n" + r["err"])
-    summary["drivers_count"] = r["out"].count("Driver Name") if "driverquery" in COMMANDS else 0
-    summary["services_length"] = len(r["out"]) if "wmic_service" in COMMANDS else 0
-    summary["elapsed_seconds"] = time.perf_counter() - start
-    write_summary_and_raw("system", summary, raw_blocks)
+    summary = {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with RawWriter("system") as raw:
+        r = run(COMMANDS["systeminfo"], 30)
+        raw.append("### systeminfo\n" + r.out + "\nERR:\n" + r.err)
+        summary["systeminfo_parsed"] = parse_kv(r.out)
+        r2 = run(COMMANDS["tasklist_csv"], 30)
+        raw.append("### tasklist\n" + r2.out + "\nERR:\n" + r2.err)
+        try:
+            summary["process_sample"] = list(itertools.islice(csv.DictReader(io.StringIO(r2.out)), 40))
+        except: summary["process_sample_parse_error"] = "CSV error"
+        for cmd in ["wevtutil_system", "wevtutil_app"]:
+            raw.stream(cmd, run, COMMANDS[cmd], 40)
+        r = run(COMMANDS["driverquery"], 40, text=False)
+        raw.append(b"### driverquery\n" + r.out + b"\nERR:\n" + r.err.encode("utf-8", "replace"))
+        summary["drivers_count"] = r.out.count(b"Module Name:")
+        r = ps.run(COMMANDS["cim_service"], 40)
+        raw.append("### cim_service\n" + r.out + "\nERR:\n" + r.err)
+        summary["services_length"] = len(r.out)
+        summary["elapsed_seconds"] = time.perf_counter() - start
+        write_summary_and_raw("system", summary, raw)
     logger.info(f"System done in {summary['elapsed_seconds']:.2f}s")
     return summary
 
-def collect_hardware():
+def collect_hardware(ps):
     start = time.perf_counter()
-    raw_blocks, summary = [], {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-    for cmd in ["wmic_cpu", "wmic_bios", "wmic_baseboard", "wmic_video"]:
-        r = run(COMMANDS[cmd], 20)
-        raw_blocks.append(f"### {cmd}\n" + r["out"] + "\nERR:\n" + r["err"])
-        summary[cmd.split("_")[1]] = parse_wmic(r["out"])
-    summary["video_raw_length"] = len(r["out"])
-    if psutil:
-        try:
-            summary["logical_cpus"] = psutil.cpu_count(True)
-            summary["physical_cpus"] = psutil.cpu_count(False)
-            cf = psutil.cpu_freq()
-            if cf: summary["cpu_freq_mhz"] = {"current": cf.current, "min": cf.min, "max": cf.max}
-            vm = psutil.virtual_memory()
-            summary["memory_total_bytes"] = vm.total
-            summary["memory_available_bytes"] = vm.available
-        except: summary["psutil_error"] = "Error"
-    else: raw_blocks.append("### psutil not available\n")
-    summary["elapsed_seconds"] = time.perf_counter() - start
-    write_summary_and_raw("hardware", summary, raw_blocks)
+    summary = {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with RawWriter("hardware") as raw:
+        for cmd in ["cim_cpu", "cim_bios", "cim_baseboard", "cim_video"]:
+            r = ps.run(COMMANDS[cmd], 20)
+            raw.append(f"### {cmd}\n" + r.out + "\nERR:\n" + r.err)
+            summary[cmd.split("_")[1]] = parse_kv(r.out, "=")
+        summary["video_raw_length"] = len(r.out)
+        psutil = load_psutil()
+        if psutil:
+            try:
+                summary["logical_cpus"] = psutil.cpu_count(True)
+                summary["physical_cpus"] = psutil.cpu_count(False)
+                cf = psutil.cpu_freq()
+                if cf: summary["cpu_freq_mhz"] = {"current": cf.current, "min": cf.min, "max": cf.max}
+                vm = psutil.virtual_memory()
+                summary["memory_total_bytes"] = vm.total
+                summary["memory_available_bytes"] = vm.available
+            except: summary["psutil_error"] = "Error"
+        else: raw.append("### psutil not available\n")
+        summary["elapsed_seconds"] = time.perf_counter() - start
+        write_summary_and_raw("hardware", summary, raw)
     logger.info(f"Hardware done in {summary['elapsed_seconds']:.2f}s")
     return summary
 
-def collect_firmware():
+def collect_firmware(ps):
     start = time.perf_counter()
-    raw_blocks, summary = [], {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-    r = run(COMMANDS["wmic_bios"], 15)
-    raw_blocks.append("### wmic bios\n" + r["out"] + "\nERR:\n" + r["err"])
-    for cmd in ["bcdedit", "powercfg_query"]:
-        r = run(COMMANDS[cmd], 20)
-        raw_blocks.append(f"### {cmd}\n" + r["out"] + "\nERR:\n" + r["err"])
-    dx_out = os.path.join(ROOT, "dxdiag_output.txt")
-    if os.path.exists(dx_out): os.remove(dx_out)
-    r = run(COMMANDS["dxdiag"], 30)
-    raw_blocks.append("### dxdiag\n" + (safe_read_file(dx_out) if os.path.exists(dx_out) else r["out"] + "\nERR:\n" + r["err"]))
-    r = run('powershell -Command "Get-WinEvent -FilterHashtable @{LogName=\'System\';Level=3} -MaxEvents 200 | Where-Object { $_.Message -match \'microcode\' } | Format-List -Property TimeCreated,Id,Message"', 30)
-    raw_blocks.append("### microcode events\n" + r["out"] + "\nERR:\n" + r["err"])
-    parsed = parse_wmic(r["out"])
-    for k in ["Manufacturer", "SMBIOSBIOSVersion", "BIOSVersion", "SerialNumber", "ReleaseDate"]:
-        if k in parsed: summary[k] = parsed[k]
-    summary["elapsed_seconds"] = time.perf_counter() - start
-    write_summary_and_raw("firmware", summary, raw_blocks)
+    summary = {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with RawWriter("firmware") as raw:
+        dx_out = os.path.join(ROOT, "dxdiag_output.txt")
+        if os.path.exists(dx_out): os.remove(dx_out)
+        dx = spawn(COMMANDS["dxdiag"], cwd=ROOT)
+        try:
+            bios = ps.run(COMMANDS["cim_bios"], 15)
+            raw.append("### cim_bios\n" + bios.out + "\nERR:\n" + bios.err)
+            for cmd in ["bcdedit", "powercfg_query"]:
+                raw.stream(cmd, run, COMMANDS[cmd], 20)
+            raw.stream("microcode events", ps.run, "Get-WinEvent -FilterHashtable @{LogName='System';Level=3} -MaxEvents 200 | Where-Object { $_.Message -match 'microcode' } | Format-List -Property TimeCreated,Id,Message", 30)
+        finally:
+            r = wait_proc(dx, COMMANDS["dxdiag"], 30)
+        raw.append("### dxdiag\n" + (safe_read_file(dx_out) if os.path.exists(dx_out) else r.out + "\nERR:\n" + r.err))
+        parsed = parse_kv(bios.out, "=")
+        for k in ["Manufacturer", "SMBIOSBIOSVersion", "BIOSVersion", "SerialNumber", "ReleaseDate"]:
+            if k in parsed: summary[k] = parsed[k]
+        summary["elapsed_seconds"] = time.perf_counter() - start
+        write_summary_and_raw("firmware", summary, raw)
     logger.info(f"Firmware done in {summary['elapsed_seconds']:.2f}s")
     return summary
 
-def collect_storage():
+def collect_storage(ps):
     start = time.perf_counter()
-    raw_blocks, summary = [], {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-    for cmd in ["wmic_diskdrive", "get_physicaldisk", "get_partition"]:
-        r = run(COMMANDS[cmd], 30)
-        raw_blocks.append(f"### {cmd}\n" + r["out"] + "\nERR:\n" + r["err"])
-    if shutil.which("smartctl"):
-        r = run("smartctl --scan", 20)
-        raw_blocks.append("### smartctl scan\n" + r["out"] + "\nERR:\n" + r["err"])
-        for line in r["out"].splitlines():
-            dev = line.split()[0]
-            if dev:
-                r = run(f"smartctl -H {dev}", 20)
-                raw_blocks.append(f"### smartctl {dev}\n" + r["out"] + "\nERR:\n" + r["err"])
-    else: raw_blocks.append("### smartctl not found\n")
-    if psutil:
-        try:
-            summary["partitions_sample"] = [{"device": p.device, "mountpoint": p.mountpoint, "fstype": p.fstype, **psutil.disk_usage(p.mountpoint)._asdict()} for p in psutil.disk_partitions(True)]
-        except: summary["partitions_error"] = "Error"
-    summary["elapsed_seconds"] = time.perf_counter() - start
-    write_summary_and_raw("storage", summary, raw_blocks)
+    summary = {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with RawWriter("storage") as raw:
+        for cmd in ["cim_diskdrive", "get_physicaldisk", "get_partition"]:
+            raw.stream(cmd, ps.run, COMMANDS[cmd], 30)
+        if shutil.which("smartctl"):
+            r = run("smartctl --scan", 20)
+            raw.append("### smartctl scan\n" + r.out + "\nERR:\n" + r.err)
+            devs = [line.split()[0] for line in r.out.splitlines() if line.strip()]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                for dev, r in zip(devs, pool.map(lambda dev: run(f"smartctl -H {dev}", 20), devs)):
+                    raw.append(f"### smartctl {dev}\n" + r.out + "\nERR:\n" + r.err)
+        else: raw.append("### smartctl not found\n")
+        psutil = load_psutil()
+        if psutil:
+            try:
+                summary["partitions_sample"] = [{"device": p.device, "mountpoint": p.mountpoint, "fstype": p.fstype, **psutil.disk_usage(p.mountpoint)._asdict()} for p in psutil.disk_partitions(True)]
+            except: summary["partitions_error"] = "Error"
+        summary["elapsed_seconds"] = time.perf_counter() - start
+        write_summary_and_raw("storage", summary, raw)
     logger.info(f"Storage done in {summary['elapsed_seconds']:.2f}s")
     return summary
 
-def collect_peripherals():
+def collect_peripherals(ps):
     start = time.perf_counter()
-    raw_blocks, summary = [], {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-    usb = run('powershell -Command "Get-PnpDevice -PresentOnly | Where-Object { $_.InstanceId -like \'USB*\' } | Format-List -Property *"', 40)
-    raw_blocks.append("### USB\n" + usb["out"] + "\nERR:\n" + usb["err"])
-    for cmd in ["get_pnp_device", "get_netadapter", "wmic_logicaldevice"]:
-        r = run(COMMANDS[cmd], 40 if "pnp" in cmd else 30)
-        raw_blocks.append(f"### {cmd}\n" + r["out"] + "\nERR:\n" + r["err"])
-    bt = run('powershell -Command "Get-PnpDevice -PresentOnly | Where-Object { $_.Class -like \'Bluetooth\' } | Format-List -Property *"', 20)
-    raw_blocks.append("### Bluetooth\n" + bt["out"] + "\nERR:\n" + bt["err"])
-    summary["usb_entries_length"] = len(usb["out"])
-    summary["pnp_entries_length"] = len(r["out"]) if "pnp" in cmd else 0
-    summary["netadapter_entries_length"] = len(r["out"]) if "netadapter" in cmd else 0
-    summary["elapsed_seconds"] = time.perf_counter() - start
-    write_summary_and_raw("peripherals", summary, raw_blocks)
+    summary = {"collected_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with RawWriter("peripherals") as raw:
+        pnp = ps.run(COMMANDS["get_pnp_device"], 40)
+        records = [(rec, parse_kv(rec)) for rec in split_records(pnp.out)]
+        usb = "\n\n".join(rec for rec, kv in records if kv.get("InstanceId", "").upper().startswith("USB"))
+        bt = "\n\n".join(rec for rec, kv in records if kv.get("Class", "").lower() == "bluetooth")
+        raw.append("### USB\n" + usb)
+        raw.append("### get_pnp_device\n" + pnp.out + "\nERR:\n" + pnp.err)
+        r = ps.run(COMMANDS["get_netadapter"], 30)
+        raw.append("### get_netadapter\n" + r.out + "\nERR:\n" + r.err)
+        summary["netadapter_entries_length"] = len(r.out)
+        raw.stream("cim_logicaldevice", ps.run, COMMANDS["cim_logicaldevice"], 30)
+        raw.append("### Bluetooth\n" + bt)
+        summary["usb_entries_length"] = len(usb)
+        summary["pnp_entries_length"] = len(pnp.out)
+        summary["elapsed_seconds"] = time.perf_counter() - start
+        write_summary_and_raw("peripherals", summary, raw)
     logger.info(f"Peripherals done in {summary['elapsed_seconds']:.2f}s")
     return summary
 
 def aggregate_results(summary_map):
-    with open(os.path.join(RESULT_DIR, "results_of_all_files.json"), "w", encoding="utf-8") as f:
-        json.dump(summary_map, f, indent=2, ensure_ascii=False)
+    write_json(os.path.join(RESULT_DIR, "results_of_all_files.json"), summary_map)
     logger.info("Aggregated results written")
 
 def is_admin():
     try: import ctypes; return ctypes.windll.shell32.IsUserAnAdmin() != 0
     except: return False
 
-def render_header():
+def render_header(console):
+    try:
+        import pyfiglet
+    except:
+        pyfiglet = None
     if pyfiglet:
         banner = pyfiglet.figlet_format("JettOX Pro", font="slant")
         console.print(f"[bold green]{banner}[/bold green]")
     else:
         console.rule("[bold green]JettOX Pro - Deep Diagnostics[/bold green]")
 
-def run_module_with_spinner(name, fn, status_map):
-    with Progress(SpinnerColumn(style="green"), TextColumn("[progress.description]{task.description}"), TimeElapsedColumn()) as progress:
-        task = progress.add_task(f"[bold bright_magenta]{name}[/bold bright_magenta] — collecting...", start=False)
-        progress.start_task(task)
-        try:
-            res = fn()
-            status_map[name] = True
-        except Exception as e:
-            res = {"error": str(e)}
-            status_map[name] = False
-        progress.stop()
+status_lock = threading.Lock()
+
+def run_module(name, fn, status_map):
+    try:
+        with PowerShellSession() as ps: res, ok = fn(ps), True
+    except Exception as e:
+        res, ok = {"error": str(e)}, False
+    with status_lock: status_map[name] = ok
     return res
 
 def main():
+    try:
+        from rich.console import Console
+        from rich.panel import Panel
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+        from rich.align import Align
+        from rich.text import Text
+        from rich import box
+    except:
+        print("Install rich")
+        raise
+    console = Console()
     ensure_dirs()
     started = datetime.now()
     logname = datetime.now().strftime("run_%Y-%m-%d_%H%M%S.txt")
     logfile = os.path.join(LOGS_DIR, logname)
     console.clear()
-    render_header()
+    render_header(console)
     admin = is_admin()
     logger.info(f"Admin: {admin}")
     if not admin: logger.warn("Not admin - limited queries")
@@ -269,13 +481,18 @@ def main():
     modules = [("system", collect_system), ("hardware", collect_hardware), ("firmware", collect_firmware), ("storage", collect_storage), ("peripherals", collect_peripherals)]
     live_status = {name: False for name, _ in modules}
     console.print("\n[bold white]Starting collection...[/bold white]\n")
-    for name, fn in modules:
-        console.print(Panel(f"[bold]{name.upper()}[/bold] — starting", subtitle="Read-only", box=box.SIMPLE))
-        res = run_module_with_spinner(name, fn, live_status)
-        summary_map[name] = res
-        elapsed = res.get("elapsed_seconds", 0)
-        console.print(f"[green]✔[/green] {name} finished in {elapsed:.2f}s\n")
-    total_elapsed = sum(summary_map.get(m, {}).get("elapsed_seconds", 0) for m, _ in modules)
+    t0 = time.perf_counter()
+    with Progress(SpinnerColumn(style="green"), TextColumn("[progress.description]{task.description}"), TimeElapsedColumn(), console=console) as progress, ThreadPoolExecutor(max_workers=len(modules)) as pool:
+        task_ids = {name: progress.add_task(f"[bold bright_magenta]{name}[/bold bright_magenta] — collecting...", total=1) for name, _ in modules}
+        def on_done(fut, name):
+            elapsed = fut.result().get("elapsed_seconds", 0)
+            progress.update(task_ids[name], completed=1, description=f"[green]✔[/green] [bold]{name}[/bold] finished in {elapsed:.2f}s")
+        futures = {}
+        for name, fn in modules:
+            futures[name] = pool.submit(run_module, name, fn, live_status)
+            futures[name].add_done_callback(lambda fut, name=name: on_done(fut, name))
+        for name, fut in futures.items(): summary_map[name] = fut.result()
+    total_elapsed = time.perf_counter() - t0
     summary_map["total_elapsed_seconds"] = total_elapsed
     aggregate_results(summary_map)
     logger.dump_to_file(logfile)